@@ -0,0 +1,185 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+
+# Настройки контроля нагрузки (переопределяются переменными окружения)
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "20"))
+ADMISSION_RATE_BURST = float(os.getenv("ADMISSION_RATE_BURST", "40"))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+ADMISSION_MAX_READS = int(os.getenv("ADMISSION_MAX_READS", "32"))
+ADMISSION_READ_QUEUE = int(os.getenv("ADMISSION_READ_QUEUE", "64"))
+ADMISSION_MAX_WRITES = int(os.getenv("ADMISSION_MAX_WRITES", "4"))
+ADMISSION_WRITE_QUEUE = int(os.getenv("ADMISSION_WRITE_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2"))
+ADMISSION_DB_LATENCY_LIMIT = float(os.getenv("ADMISSION_DB_LATENCY_LIMIT", "0.5"))
+
+# Пути документации не ограничиваются
+EXEMPT_PATHS = {"/", "/openapi.json", "/docs/oauth2-redirect"}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBuckets:
+    """
+    Ограничение частоты запросов для каждого клиента.
+    """
+
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        # Порядок обращений: в начале клиенты, дольше всех не присылавшие запросов
+        self.buckets = OrderedDict()
+
+    def take(self, client: str):
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        allowed = tokens >= 1
+        self.buckets[client] = (tokens - 1 if allowed else tokens, now)
+        self.buckets.move_to_end(client)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        if not allowed:
+            raise Rejected(429, "Слишком много запросов", (1 - tokens) / self.rate)
+
+
+class ConcurrencyBudget:
+    """
+    Ограничение одновременно выполняемых запросов с очередью ограниченной длины.
+    """
+
+    def __init__(self, name: str, limit: int, queue_limit: int, timeout: float):
+        self.name = name
+        self.semaphore = asyncio.Semaphore(limit)
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+
+    async def acquire(self):
+        if self.semaphore.locked():
+            if self.waiting >= self.queue_limit:
+                raise Rejected(503, f"Очередь запросов ({self.name}) переполнена", self.timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                raise Rejected(503, f"Превышено время ожидания в очереди ({self.name})", self.timeout)
+            finally:
+                self.waiting -= 1
+        else:
+            await self.semaphore.acquire()
+        self.in_flight += 1
+
+    def release(self):
+        self.in_flight -= 1
+        self.semaphore.release()
+
+
+class DatabaseLatency:
+    """
+    Скользящее среднее времени выполнения запросов к базе (включая ожидание блокировок SQLite).
+    """
+
+    def __init__(self, alpha: float = 0.2, stale_after: float = 5.0):
+        self.alpha = alpha
+        self.stale_after = stale_after
+        self.average = 0.0
+        self.updated = 0.0
+
+    def observe(self, seconds: float):
+        self.average += self.alpha * (seconds - self.average)
+        self.updated = time.monotonic()
+
+    def current(self) -> float:
+        # Без новых замеров база считается разгруженной
+        if time.monotonic() - self.updated > self.stale_after:
+            return 0.0
+        return self.average
+
+    def track(self, engine):
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("admission_started", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            self.observe(time.perf_counter() - conn.info["admission_started"].pop())
+
+        # При ошибке запроса after_cursor_execute не вызывается, отметка снимается здесь
+        @event.listens_for(engine, "handle_error")
+        def _error(context):
+            if context.connection is not None and context.connection.info.get("admission_started"):
+                context.connection.info["admission_started"].pop()
+
+
+db_latency = DatabaseLatency()
+
+
+def track_database(*engines):
+    for engine in engines:
+        db_latency.track(engine)
+
+
+class AdmissionMiddleware:
+    """
+    ASGI-middleware контроля допуска запросов.
+
+    Запрос отклоняется до попадания в пул потоков и очередь блокировки SQLite:
+    429 при превышении частоты для клиента, 503 при переполнении очереди
+    чтения/записи или при росте задержки базы (только запись).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.buckets = TokenBuckets(ADMISSION_RATE_PER_SECOND, ADMISSION_RATE_BURST, ADMISSION_MAX_CLIENTS)
+        self.reads = ConcurrencyBudget("чтение", ADMISSION_MAX_READS, ADMISSION_READ_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+        self.writes = ConcurrencyBudget("запись", ADMISSION_MAX_WRITES, ADMISSION_WRITE_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        is_write = scope["method"] in WRITE_METHODS
+        budget = self.writes if is_write else self.reads
+        try:
+            self.buckets.take(client)
+            if is_write and db_latency.current() > ADMISSION_DB_LATENCY_LIMIT:
+                raise Rejected(503, "База данных перегружена", db_latency.current())
+            await budget.acquire()
+        except Rejected as rejected:
+            await self._reject(send, rejected)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
+
+    @staticmethod
+    async def _reject(send, rejected: Rejected):
+        body = json.dumps({"detail": rejected.detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": rejected.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", str(rejected.retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
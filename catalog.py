@@ -0,0 +1,120 @@
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from sqlalchemy.orm import Session
+
+from models.models import Brand, Store, Product
+
+# Включать ли продукты в снимок каталога
+CATALOG_INCLUDE_PRODUCTS = os.getenv("CATALOG_INCLUDE_PRODUCTS", "0") == "1"
+
+
+class _Record:
+    """
+    Компактная неизменяемая запись каталога.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Записи каталога доступны только для чтения")
+
+    def dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class BrandRecord(_Record):
+    __slots__ = ("id", "name", "description", "version", "updated_at")
+
+
+class StoreRecord(_Record):
+    __slots__ = ("id", "name", "description", "version", "updated_at")
+
+
+class ProductRecord(_Record):
+    __slots__ = ("id", "name", "description", "price", "store_id", "brand_id", "version", "updated_at")
+
+
+class CatalogSnapshot:
+    """
+    Версионированный снимок каталога только для чтения.
+
+    Тело ответа сериализуется один раз при построении снимка,
+    ETag вычисляется по содержимому и не зависит от процесса.
+    """
+    __slots__ = ("version", "brands", "stores", "products", "body", "etag")
+
+    def __init__(self, version: int, brands: dict, stores: dict, products: dict = None):
+        self.version = version
+        self.brands = MappingProxyType(brands)
+        self.stores = MappingProxyType(stores)
+        self.products = None if products is None else MappingProxyType(products)
+
+        content = json.dumps({
+            "brands": [record.dict() for record in self.brands.values()],
+            "stores": [record.dict() for record in self.stores.values()],
+            "products": None if self.products is None else [record.dict() for record in self.products.values()],
+        }, ensure_ascii=False, separators=(",", ":"), default=lambda value: value.isoformat())
+        self.etag = '"catalog-' + hashlib.sha1(content.encode("utf-8")).hexdigest() + '"'
+        self.body = ('{"version":%d,' % version + content[1:]).encode("utf-8")
+
+
+def _load_brands(db: Session) -> dict:
+    rows = db.query(Brand.id, Brand.name, Brand.description, Brand.version, Brand.updated_at).order_by(Brand.id)
+    return {row.id: BrandRecord(*row) for row in rows}
+
+
+def _load_stores(db: Session) -> dict:
+    rows = db.query(Store.id, Store.name, Store.description, Store.version, Store.updated_at).order_by(Store.id)
+    return {row.id: StoreRecord(*row) for row in rows}
+
+
+def _load_products(db: Session) -> dict:
+    rows = db.query(Product.id, Product.name, Product.description, Product.price,
+                    Product.store_id, Product.brand_id, Product.version, Product.updated_at).order_by(Product.id)
+    return {row.id: ProductRecord(*row) for row in rows}
+
+
+_snapshot = CatalogSnapshot(0, {}, {}, {} if CATALOG_INCLUDE_PRODUCTS else None)
+_refresh_lock = threading.Lock()
+
+
+# Текущий снимок каталога (читатели получают его один раз на запрос)
+def current_catalog() -> CatalogSnapshot:
+    return _snapshot
+
+
+def refresh_catalog(db: Session, brands: bool = True, stores: bool = True, products: bool = True):
+    """
+    Перестроить снимок каталога и атомарно заменить текущий.
+
+    Неизмененные части переиспользуются из предыдущего снимка.
+
+    Параметры:
+    - db: Сессия базы данных.
+    - brands (bool): Перечитать бренды.
+    - stores (bool): Перечитать магазины.
+    - products (bool): Перечитать продукты (если они включены в снимок).
+    """
+    global _snapshot
+    if not (brands or stores or (products and CATALOG_INCLUDE_PRODUCTS)):
+        return
+    with _refresh_lock:
+        previous = _snapshot
+        _snapshot = CatalogSnapshot(
+            previous.version + 1,
+            _load_brands(db) if brands else dict(previous.brands),
+            _load_stores(db) if stores else dict(previous.stores),
+            (_load_products(db) if products else dict(previous.products)) if CATALOG_INCLUDE_PRODUCTS else None,
+        )
+
+
+# Загрузка каталога при старте приложения
+def load_catalog(db: Session):
+    refresh_catalog(db)
@@ -1,19 +1,122 @@
+import os
+import threading
+from contextlib import contextmanager
+
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
-from models.models import Base
+from sqlalchemy import create_engine, event, func, insert, select
+from models.models import Base, DatabaseSetting, Statistic
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./shops.db"
 
+# Количество шардов статистики (0 — статистика хранится в основной базе)
+STATISTICS_SHARDS = int(os.getenv("STATISTICS_SHARDS", "0"))
+STATISTICS_SHARD_URL = "sqlite:///./shops_statistics_{}.db"
+
 # Создание синхронного соединения с базой данных
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 
+# Отдельный файл SQLite на каждый шард, у каждого своя блокировка записи
+if STATISTICS_SHARDS:
+    statistic_engines = [
+        create_engine(STATISTICS_SHARD_URL.format(shard), connect_args={"check_same_thread": False})
+        for shard in range(STATISTICS_SHARDS)
+    ]
+else:
+    statistic_engines = [engine]
+
+
+# Инкрементальный VACUUM для новых баз (на существующих вступает в силу после полного VACUUM)
+# и журнал WAL: длинные чтения отчетов не блокируют запись
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.close()
+
+
+for _engine in {engine, *statistic_engines}:
+    event.listen(_engine, "connect", _set_sqlite_pragmas)
+
 # Определение синхронной сессии для работы с базой данных
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Сессии и блокировки записи для шардов статистики
+StatisticSessions = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in statistic_engines]
+statistic_write_locks = [threading.Lock() for _ in statistic_engines]
+
+
+# Колонки, добавленные в модели после создания таблиц: create_all не изменяет существующие таблицы
+_VERSION_COLUMNS = [("version", "INTEGER NOT NULL DEFAULT 1"), ("updated_at", "DATETIME")]
+ADDED_COLUMNS = {
+    "users": _VERSION_COLUMNS,
+    "stores": _VERSION_COLUMNS,
+    "brands": _VERSION_COLUMNS,
+    "products": _VERSION_COLUMNS,
+    "payments": _VERSION_COLUMNS + [("created_at", "DATETIME")],
+    "statistics": _VERSION_COLUMNS,
+    "statistic_retention_state": [("pending_ids", "TEXT")],
+}
+ADDED_INDEXES = {
+    "payments": [("ix_payments_created_at", "created_at")],
+}
+
+
+def migrate_db(bind, tables):
+    """
+    Добавить в существующие таблицы недостающие колонки и индексы.
+
+    Повторный запуск ничего не меняет.
+
+    Параметры:
+    - bind: Движок базы данных.
+    - tables: Имена таблиц, которые нужно проверить.
+    """
+    with bind.begin() as connection:
+        for table in tables:
+            existing = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+            for column, ddl in ADDED_COLUMNS.get(table, []):
+                if existing and column not in existing:
+                    connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+            for index, column in ADDED_INDEXES.get(table, []):
+                if existing:
+                    connection.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({column})")
+
+
+def check_statistic_shards(bind, shards: int):
+    """
+    Проверить, что количество шардов статистики не изменилось.
+
+    Количество шардов сохраняется в основной базе при первом запуске.
+    ID статистики и распределение магазинов по шардам зависят от него,
+    поэтому запуск с другим значением или с включенным шардированием
+    при непустой таблице statistics основной базы прерывается.
+
+    Параметры:
+    - bind: Движок основной базы данных.
+    - shards (int): Настроенное количество шардов (0 — без шардирования).
+    """
+    with bind.begin() as connection:
+        stored = connection.execute(
+            select(DatabaseSetting.value).where(DatabaseSetting.key == "statistics_shards")).scalar()
+        if stored is not None and int(stored) != shards:
+            raise RuntimeError(f"База создана с STATISTICS_SHARDS={stored}, настроено {shards}: "
+                               "перераспределение статистики между шардами не поддерживается")
+        if shards and connection.execute(select(func.count()).select_from(Statistic)).scalar():
+            raise RuntimeError("Таблица statistics основной базы не пуста: "
+                               "перед включением шардирования перенесите события в шарды")
+        if stored is None:
+            connection.execute(insert(DatabaseSetting).values(key="statistics_shards", value=str(shards)))
+
 
 # Функция для инициализации базы данных
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrate_db(engine, Base.metadata.tables)
+    check_statistic_shards(engine, STATISTICS_SHARDS)
+    if STATISTICS_SHARDS:
+        for shard_engine in statistic_engines:
+            Statistic.__table__.create(bind=shard_engine, checkfirst=True)
+            migrate_db(shard_engine, [Statistic.__tablename__])
 
 
 # Функция для получения сессии базы данных
@@ -29,3 +132,32 @@ def get_db():
 def create_tables():
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    if STATISTICS_SHARDS:
+        for shard_engine in statistic_engines:
+            Statistic.__table__.drop(bind=shard_engine, checkfirst=True)
+            Statistic.__table__.create(bind=shard_engine)
+    check_statistic_shards(engine, STATISTICS_SHARDS)
+
+
+# Номер шарда статистики для магазина
+def statistic_shard(store_id: int) -> int:
+    return store_id % len(statistic_engines)
+
+
+# Глобальный ID статистики: локальный ID в шарде и номер шарда
+def encode_statistic_id(local_id: int, shard: int) -> int:
+    return local_id * len(statistic_engines) + shard
+
+
+def decode_statistic_id(statistic_id: int) -> tuple:
+    return divmod(statistic_id, len(statistic_engines))
+
+
+# Функция для получения сессии шарда статистики
+@contextmanager
+def statistic_session(shard: int):
+    db = StatisticSessions[shard]()
+    try:
+        yield db
+    finally:
+        db.close()
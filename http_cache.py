@@ -0,0 +1,85 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+
+# ETag строки: сущность, ID и версия
+def row_etag(kind: str, row_id: int, version: int) -> str:
+    return f'"{kind}-{row_id}-{version}"'
+
+
+def collection_etag(db: Session, model, *params) -> str:
+    """
+    Вычислить ETag коллекции одним агрегатным запросом.
+
+    ETag меняется при создании, удалении и обновлении любой строки
+    таблицы, а также при изменении параметров выборки. Время последнего
+    изменения учитывается, потому что SQLite переиспользует ID после
+    удаления: удаление и создание строки не меняют количество и суммы.
+
+    Параметры:
+    - db: Сессия базы данных.
+    - model: Модель SQLAlchemy с колонкой version.
+    - params: Параметры выборки (пагинация, фильтры).
+
+    Возвращает:
+    - str: ETag коллекции.
+    """
+    count, id_sum, version_sum, last_modified = db.query(
+        func.count(model.id), func.coalesce(func.sum(model.id), 0), func.coalesce(func.sum(model.version), 0),
+        func.max(model.updated_at),
+    ).one()
+    seed = f"{model.__tablename__}:{count}:{id_sum}:{version_sum}:{last_modified}:{params}"
+    return '"' + model.__tablename__ + "-" + hashlib.sha1(seed.encode("utf-8")).hexdigest() + '"'
+
+
+def cache_headers(etag: str, last_modified: datetime = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime = None) -> bool:
+    """
+    Проверить условные заголовки запроса.
+
+    If-None-Match имеет приоритет, If-Modified-Since учитывается только без него.
+    Дата в заголовках точна до секунды, поэтому 304 по дате отдается, только
+    если ресурс изменен в более раннюю секунду: изменения в ту же секунду
+    различаются только по ETag.
+
+    Параметры:
+    - request: Входящий запрос.
+    - etag (str): Текущий ETag ресурса.
+    - last_modified (datetime): Время последнего изменения ресурса (UTC).
+
+    Возвращает:
+    - bool: True, если клиенту можно ответить 304.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) < since
+    return False
+
+
+def not_modified_response(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
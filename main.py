@@ -1,14 +1,42 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
-from database import init_db, create_tables
+from database import init_db, create_tables, SessionLocal, engine, statistic_engines
+from admission import AdmissionMiddleware, track_database
+from catalog import load_catalog
+from security import start_password_pool, shutdown_password_pool
+from reports import shutdown_report_pool
 from modules.brand import brands
+from modules.catalog import catalog
 from modules.payment import payments
 from modules.shop import stores
 from modules.statistic import statistics
 from modules.user import users
 from modules.product import products
+from modules.report import reports
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Создание и обновление схемы, загрузка снимка каталога при старте
+    init_db()
+    db = SessionLocal()
+    try:
+        load_catalog(db)
+    finally:
+        db.close()
+    start_password_pool()
+    yield
+    shutdown_password_pool()
+    shutdown_report_pool()
+
+
+app = FastAPI(docs_url="/", lifespan=lifespan)
 
-app = FastAPI(docs_url="/")
+# Контроль допуска запросов и учет задержки базы
+track_database(*{engine, *statistic_engines})
+app.add_middleware(AdmissionMiddleware)
 
 
 app.include_router(statistics, tags=["Статистика"], prefix="/statistics")
@@ -17,6 +45,8 @@ app.include_router(stores, tags=["Магазины"], prefix="/stores")
 app.include_router(users, tags=["Пользователи"], prefix="/users")
 app.include_router(products, tags=["Продукты"], prefix="/products")
 app.include_router(payments, tags=["Платежи"], prefix="/payments")
+app.include_router(catalog, tags=["Каталог"], prefix="/catalog")
+app.include_router(reports, tags=["Отчеты"], prefix="/reports")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, Text, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -6,7 +6,13 @@ from datetime import datetime
 Base = declarative_base()
 
 
-class User(Base):
+class VersionMixin:
+    # Версия строки для ETag, увеличивается обработчиками обновления
+    version = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class User(VersionMixin, Base):
     __tablename__ = 'users'
 
     id = Column(Integer, primary_key=True, index=True)
@@ -18,7 +24,7 @@ class User(Base):
     statistics = relationship("Statistic", back_populates="user")
 
 
-class Store(Base):
+class Store(VersionMixin, Base):
     __tablename__ = 'stores'
 
     id = Column(Integer, primary_key=True, index=True)
@@ -30,7 +36,7 @@ class Store(Base):
     statistics = relationship("Statistic", back_populates="store")
 
 
-class Brand(Base):
+class Brand(VersionMixin, Base):
     __tablename__ = 'brands'
 
     id = Column(Integer, primary_key=True, index=True)
@@ -40,7 +46,7 @@ class Brand(Base):
     products = relationship("Product", back_populates="brand")
 
 
-class Product(Base):
+class Product(VersionMixin, Base):
     __tablename__ = 'products'
 
     id = Column(Integer, primary_key=True, index=True)
@@ -56,12 +62,13 @@ class Product(Base):
     statistics = relationship("Statistic", back_populates="product")
 
 
-class Payment(Base):
+class Payment(VersionMixin, Base):
     __tablename__ = 'payments'
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float)
     description = Column(String)
+    created_at = Column(DateTime, index=True, default=datetime.utcnow)
     user_id = Column(Integer, ForeignKey('users.id'))
     product_id = Column(Integer, ForeignKey('products.id'))
     store_id = Column(Integer, ForeignKey('stores.id'))
@@ -71,7 +78,7 @@ class Payment(Base):
     store = relationship("Store", back_populates="payments")
 
 
-class Statistic(Base):
+class Statistic(VersionMixin, Base):
     __tablename__ = 'statistics'
 
     id = Column(Integer, primary_key=True, index=True)
@@ -84,3 +91,32 @@ class Statistic(Base):
     user = relationship("User", back_populates="statistics")
     product = relationship("Product", back_populates="statistics")
     store = relationship("Store", back_populates="statistics")
+
+
+class StatisticAggregate(Base):
+    __tablename__ = 'statistic_aggregates'
+    __table_args__ = (UniqueConstraint('day', 'event_type', 'store_id', 'product_id'),)
+
+    # Дневные агрегаты событий, перенесенных из statistics в архив
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    event_type = Column(String)
+    store_id = Column(Integer, ForeignKey('stores.id'))
+    product_id = Column(Integer, ForeignKey('products.id'))
+    count = Column(Integer, default=0)
+
+
+class StatisticRetentionState(Base):
+    __tablename__ = 'statistic_retention_state'
+
+    # Пачка шарда, уже свернутая в агрегаты, но еще не удаленная из шарда
+    shard = Column(Integer, primary_key=True)
+    pending_ids = Column(Text)  # JSON-список ID пачки
+
+
+class DatabaseSetting(Base):
+    __tablename__ = 'database_settings'
+
+    # Параметры, с которыми создана база (например, количество шардов статистики)
+    key = Column(String, primary_key=True)
+    value = Column(String)
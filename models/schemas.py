@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Literal
 from datetime import datetime
 from typing import List
 
@@ -51,12 +51,78 @@ class StatisticResponse(BaseModel):
     store_id: int
 
 
+class StoreBrandCount(BaseModel):
+    brand_id: Optional[int]
+    name: Optional[str]
+    product_count: int
+
+
+class StoreRevenue(BaseModel):
+    payments: int
+    total: float
+    average: float
+
+
+class StoreEventCount(BaseModel):
+    event_type: str
+    count: int
+
+
+class StoreSummaryResponse(BaseModel):
+    store_id: int
+    product_count: int
+    brands: List[StoreBrandCount]
+    revenue: StoreRevenue
+    events_since: datetime
+    events: List[StoreEventCount]
+    generated_at: datetime
+
+
+class ReportJobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+
+class ReportResultResponse(BaseModel):
+    id: str
+    kind: str
+    rows: List[dict]
+
+
+class CatalogResponse(BaseModel):
+    version: int
+    brands: List[BrandResponse]
+    stores: List[StoreResponse]
+    products: Optional[List[ProductResponse]]
+
+
+class StatisticCount(BaseModel):
+    event_type: str
+    store_id: int
+    count: int
+
+
+class RetentionResponse(BaseModel):
+    archived: int
+    cutoff: datetime
+    partitions: List[str]
+
+
 # Pydantic схемы для создания (create)
 
 class UserCreate(BaseModel):
     username: str
     email: str
-    password_hash: str
+    password: str
+
+
+class UserLogin(BaseModel):
+    username: str
+    password: str
 
 
 class StoreCreate(BaseModel):
@@ -91,3 +157,12 @@ class StatisticCreate(BaseModel):
     user_id: int
     product_id: int
     store_id: int
+
+
+class ReportCreate(BaseModel):
+    kind: Literal["revenue_by_brand", "store_event_histogram"]
+    start: datetime
+    end: datetime
+    store_id: Optional[int] = None
+    event_type: Optional[str] = None
+    bucket: Literal["hour", "day"] = "day"
@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
-from models.models import Brand
+from models.models import Brand, Product
 from models.schemas import BrandCreate, BrandResponse
 from database import get_db
+from store_summary import invalidate_store_summary
+from http_cache import collection_etag, row_etag, cache_headers, is_not_modified, not_modified_response
+from catalog import current_catalog, refresh_catalog
 
 brands = APIRouter()
 
+
+# Магазины, в сводке которых есть бренд
+def _brand_store_ids(db: Session, brand_id: int) -> list:
+    return [store_id for store_id, in db.query(Product.store_id).filter(Product.brand_id == brand_id).distinct()]
+
 # Маршруты для сущности Brand
 
 
@@ -26,13 +36,38 @@ def create_brand(brand: BrandCreate, db: Session = Depends(get_db)):
         db.add(db_brand)
         db.commit()
         db.refresh(db_brand)
+        refresh_catalog(db, stores=False, products=False)
         return db_brand
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании бренда - " + str(e))
 
 
+@brands.get("/", response_model=List[BrandResponse], status_code=status.HTTP_200_OK, summary="Получить список брендов")
+def read_brands(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Получить список брендов.
+
+    ETag коллекции позволяет клиенту не загружать неизмененный список повторно.
+
+    Параметры:
+    - skip (int): Количество пропускаемых записей.
+    - limit (int): Максимальное количество записей.
+
+    Возвращает:
+    - List[BrandResponse]: Список брендов.
+    """
+    try:
+        headers = cache_headers(collection_etag(db, Brand, skip, limit))
+        if is_not_modified(request, headers["ETag"]):
+            return not_modified_response(headers)
+        response.headers.update(headers)
+        return db.query(Brand).order_by(Brand.id).offset(skip).limit(limit).all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении списка брендов - " + str(e))
+
+
 @brands.get("/{brand_id}", response_model=BrandResponse, status_code=status.HTTP_200_OK, summary="Получить бренд по ID")
-def read_brand(brand_id: int, db: Session = Depends(get_db)):
+def read_brand(brand_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Получить бренд по ID.
 
@@ -43,9 +78,15 @@ def read_brand(brand_id: int, db: Session = Depends(get_db)):
     - BrandResponse: Полученный бренд.
     """
     try:
-        db_brand = db.query(Brand).filter(Brand.id == brand_id).first()
+        db_brand = current_catalog().brands.get(brand_id)
+        if db_brand is None:
+            db_brand = db.query(Brand).filter(Brand.id == brand_id).first()
         if db_brand is None:
             raise HTTPException(status_code=404, detail="Бренд не найден")
+        headers = cache_headers(row_etag("brand", db_brand.id, db_brand.version), db_brand.updated_at)
+        if is_not_modified(request, headers["ETag"], db_brand.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
         return db_brand
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении бренда - " + str(e))
@@ -69,8 +110,11 @@ def update_brand(brand_id: int, brand: BrandCreate, db: Session = Depends(get_db
             raise HTTPException(status_code=404, detail="Бренд не найден")
         for attr, value in brand.dict().items():
             setattr(db_brand, attr, value)
+        db_brand.version += 1
         db.commit()
         db.refresh(db_brand)
+        refresh_catalog(db, stores=False, products=False)
+        invalidate_store_summary(*_brand_store_ids(db, brand_id))
         return db_brand
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении бренда - " + str(e))
@@ -91,8 +135,11 @@ def delete_brand(brand_id: int, db: Session = Depends(get_db)):
         db_brand = db.query(Brand).filter(Brand.id == brand_id).first()
         if db_brand is None:
             raise HTTPException(status_code=404, detail="Бренд не найден")
+        store_ids = _brand_store_ids(db, brand_id)
         db.delete(db_brand)
         db.commit()
+        refresh_catalog(db, stores=False, products=False)
+        invalidate_store_summary(*store_ids)
         return db_brand
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при удалении бренда - " + str(e))
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from catalog import current_catalog
+from http_cache import etag_matches, not_modified_response
+from models.schemas import CatalogResponse
+
+catalog = APIRouter()
+
+# Маршруты для снимка каталога
+
+
+@catalog.get("/", response_model=CatalogResponse, status_code=status.HTTP_200_OK, summary="Получить каталог брендов и магазинов")
+def read_catalog(if_none_match: Optional[str] = Header(None)):
+    """
+    Получить снимок каталога брендов, магазинов и (опционально) продуктов.
+
+    Если ETag из заголовка If-None-Match совпадает с текущим, возвращается 304.
+
+    Параметры:
+    - if_none_match (str): Заголовок If-None-Match.
+
+    Возвращает:
+    - CatalogResponse: Снимок каталога.
+    """
+    try:
+        snapshot = current_catalog()
+        headers = {"ETag": snapshot.etag}
+        if if_none_match is not None and etag_matches(if_none_match, snapshot.etag):
+            return not_modified_response(headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении каталога - " + str(e))
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from models.models import Payment
 from models.schemas import PaymentCreate, PaymentResponse
 from database import get_db
+from store_summary import invalidate_store_summary
+from http_cache import row_etag, cache_headers, is_not_modified, not_modified_response
 
 payments = APIRouter()
 
@@ -26,13 +28,14 @@ def create_payment(payment: PaymentCreate, db: Session = Depends(get_db)):
         db.add(db_payment)
         db.commit()
         db.refresh(db_payment)
+        invalidate_store_summary(db_payment.store_id)
         return db_payment
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании платежа - " + str(e))
 
 
 @payments.get("/{payment_id}", response_model=PaymentResponse, status_code=status.HTTP_200_OK, summary="Получить платеж по ID")
-def read_payment(payment_id: int, db: Session = Depends(get_db)):
+def read_payment(payment_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Получить платеж по ID.
 
@@ -46,6 +49,10 @@ def read_payment(payment_id: int, db: Session = Depends(get_db)):
         db_payment = db.query(Payment).filter(Payment.id == payment_id).first()
         if db_payment is None:
             raise HTTPException(status_code=404, detail="Платеж не найден")
+        headers = cache_headers(row_etag("payment", db_payment.id, db_payment.version), db_payment.updated_at)
+        if is_not_modified(request, headers["ETag"], db_payment.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
         return db_payment
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении платежа - " + str(e))
@@ -67,10 +74,13 @@ def update_payment(payment_id: int, payment: PaymentCreate, db: Session = Depend
         db_payment = db.query(Payment).filter(Payment.id == payment_id).first()
         if db_payment is None:
             raise HTTPException(status_code=404, detail="Платеж не найден")
+        previous_store_id = db_payment.store_id
         for attr, value in payment.dict().items():
             setattr(db_payment, attr, value)
+        db_payment.version += 1
         db.commit()
         db.refresh(db_payment)
+        invalidate_store_summary(previous_store_id, db_payment.store_id)
         return db_payment
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении платежа - " + str(e))
@@ -93,6 +103,7 @@ def delete_payment(payment_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Платеж не найден")
         db.delete(db_payment)
         db.commit()
+        invalidate_store_summary(db_payment.store_id)
         return db_payment
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при удалении платежа - " + str(e))
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from models.models import Product
 from models.schemas import ProductCreate, ProductResponse
 from database import get_db
+from store_summary import invalidate_store_summary
+from http_cache import collection_etag, row_etag, cache_headers, is_not_modified, not_modified_response
+from catalog import current_catalog, refresh_catalog
 
 products = APIRouter()
 
@@ -26,13 +31,39 @@ def create_product(product: ProductCreate, db: Session = Depends(get_db)):
         db.add(db_product)
         db.commit()
         db.refresh(db_product)
+        refresh_catalog(db, brands=False, stores=False)
+        invalidate_store_summary(db_product.store_id)
         return db_product
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании продукта - " + str(e))
 
 
+@products.get("/", response_model=List[ProductResponse], status_code=status.HTTP_200_OK, summary="Получить список продуктов")
+def read_products(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Получить список продуктов.
+
+    ETag коллекции позволяет клиенту не загружать неизмененный список повторно.
+
+    Параметры:
+    - skip (int): Количество пропускаемых записей.
+    - limit (int): Максимальное количество записей.
+
+    Возвращает:
+    - List[ProductResponse]: Список продуктов.
+    """
+    try:
+        headers = cache_headers(collection_etag(db, Product, skip, limit))
+        if is_not_modified(request, headers["ETag"]):
+            return not_modified_response(headers)
+        response.headers.update(headers)
+        return db.query(Product).order_by(Product.id).offset(skip).limit(limit).all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении списка продуктов - " + str(e))
+
+
 @products.get("/{product_id}", response_model=ProductResponse, status_code=status.HTTP_200_OK, summary="Получить продукт по ID")
-def read_product(product_id: int, db: Session = Depends(get_db)):
+def read_product(product_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Получить продукт по ID.
 
@@ -43,9 +74,16 @@ def read_product(product_id: int, db: Session = Depends(get_db)):
     - ProductResponse: Полученный продукт.
     """
     try:
-        db_product = db.query(Product).filter(Product.id == product_id).first()
+        records = current_catalog().products
+        db_product = records.get(product_id) if records is not None else None
+        if db_product is None:
+            db_product = db.query(Product).filter(Product.id == product_id).first()
         if db_product is None:
             raise HTTPException(status_code=404, detail="Продукт не найден")
+        headers = cache_headers(row_etag("product", db_product.id, db_product.version), db_product.updated_at)
+        if is_not_modified(request, headers["ETag"], db_product.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
         return db_product
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении продукта - " + str(e))
@@ -67,10 +105,14 @@ def update_product(product_id: int, product: ProductCreate, db: Session = Depend
         db_product = db.query(Product).filter(Product.id == product_id).first()
         if db_product is None:
             raise HTTPException(status_code=404, detail="Продукт не найден")
+        previous_store_id = db_product.store_id
         for attr, value in product.dict().items():
             setattr(db_product, attr, value)
+        db_product.version += 1
         db.commit()
         db.refresh(db_product)
+        refresh_catalog(db, brands=False, stores=False)
+        invalidate_store_summary(previous_store_id, db_product.store_id)
         return db_product
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении продукта - " + str(e))
@@ -93,6 +135,8 @@ def delete_product(product_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Продукт не найден")
         db.delete(db_product)
         db.commit()
+        refresh_catalog(db, brands=False, stores=False)
+        invalidate_store_summary(db_product.store_id)
         return db_product
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при удалении продукта - " + str(e))
@@ -0,0 +1,78 @@
+import json
+
+from fastapi import APIRouter, HTTPException, Response, status
+
+from models.schemas import ReportCreate, ReportJobResponse, ReportResultResponse
+from reports import ReportQueueFull, submit_report, get_report_job
+
+reports = APIRouter()
+
+# Маршруты для фоновых отчетов
+
+
+@reports.post("/", response_model=ReportJobResponse, status_code=status.HTTP_202_ACCEPTED, summary="Поставить отчет в очередь")
+def create_report(report: ReportCreate):
+    """
+    Поставить отчет в очередь.
+
+    Повторный запрос с теми же параметрами возвращает существующее задание.
+
+    Параметры:
+    - report: ReportCreate - Тип и параметры отчета.
+
+    Возвращает:
+    - ReportJobResponse: Задание на построение отчета.
+    """
+    try:
+        params = report.dict(exclude={"kind"})
+        return submit_report(report.kind, params)
+    except ReportQueueFull:
+        raise HTTPException(status_code=503, detail="Очередь отчетов переполнена",
+                            headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при создании отчета - " + str(e))
+
+
+@reports.get("/{job_id}", response_model=ReportJobResponse, status_code=status.HTTP_200_OK, summary="Получить статус отчета")
+def read_report(job_id: str):
+    """
+    Получить статус отчета.
+
+    Параметры:
+    - job_id (str): ID задания.
+
+    Возвращает:
+    - ReportJobResponse: Задание на построение отчета.
+    """
+    job = get_report_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Отчет не найден")
+    return job
+
+
+@reports.get("/{job_id}/result", response_model=ReportResultResponse, status_code=status.HTTP_200_OK, summary="Получить результат отчета")
+def read_report_result(job_id: str, format: str = "json"):
+    """
+    Получить результат отчета.
+
+    Параметры:
+    - job_id (str): ID задания.
+    - format (str): Формат результата (json или csv).
+
+    Возвращает:
+    - ReportResultResponse: Строки отчета (или CSV-файл).
+    """
+    job = get_report_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Отчет не найден")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail="Произошла ошибка при построении отчета - " + job.error)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="Отчет еще не готов")
+    try:
+        if format == "csv":
+            return Response(content=job.result.to_csv(index=False), media_type="text/csv",
+                            headers={"Content-Disposition": f'attachment; filename="{job.kind}-{job.id}.csv"'})
+        return {"id": job.id, "kind": job.kind, "rows": json.loads(job.result.to_json(orient="records"))}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении отчета - " + str(e))
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 
 from models.models import Store
-from models.schemas import StoreCreate, StoreResponse
+from models.schemas import StoreCreate, StoreResponse, StoreSummaryResponse
 from database import get_db
+from http_cache import collection_etag, row_etag, cache_headers, is_not_modified, not_modified_response
+from catalog import current_catalog, refresh_catalog
+from store_summary import get_store_summary, invalidate_store_summary
 
 stores = APIRouter()
 
@@ -26,13 +31,38 @@ def create_store(store: StoreCreate, db: Session = Depends(get_db)):
         db.add(db_store)
         db.commit()
         db.refresh(db_store)
+        refresh_catalog(db, brands=False, products=False)
         return db_store
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании магазина - " + str(e))
 
 
+@stores.get("/", response_model=List[StoreResponse], status_code=status.HTTP_200_OK, summary="Получить список магазинов")
+def read_stores(request: Request, response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    """
+    Получить список магазинов.
+
+    ETag коллекции позволяет клиенту не загружать неизмененный список повторно.
+
+    Параметры:
+    - skip (int): Количество пропускаемых записей.
+    - limit (int): Максимальное количество записей.
+
+    Возвращает:
+    - List[StoreResponse]: Список магазинов.
+    """
+    try:
+        headers = cache_headers(collection_etag(db, Store, skip, limit))
+        if is_not_modified(request, headers["ETag"]):
+            return not_modified_response(headers)
+        response.headers.update(headers)
+        return db.query(Store).order_by(Store.id).offset(skip).limit(limit).all()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении списка магазинов - " + str(e))
+
+
 @stores.get("/{store_id}", response_model=StoreResponse, status_code=status.HTTP_200_OK, summary="Получить магазин по ID")
-def read_store(store_id: int, db: Session = Depends(get_db)):
+def read_store(store_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Получить магазин по ID.
 
@@ -43,14 +73,45 @@ def read_store(store_id: int, db: Session = Depends(get_db)):
     - StoreResponse: Полученный магазин.
     """
     try:
-        db_store = db.query(Store).filter(Store.id == store_id).first()
+        db_store = current_catalog().stores.get(store_id)
+        if db_store is None:
+            db_store = db.query(Store).filter(Store.id == store_id).first()
         if db_store is None:
             raise HTTPException(status_code=404, detail="Магазин не найден")
+        headers = cache_headers(row_etag("store", db_store.id, db_store.version), db_store.updated_at)
+        if is_not_modified(request, headers["ETag"], db_store.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
         return db_store
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении магазина - " + str(e))
 
 
+@stores.get("/{store_id}/summary", response_model=StoreSummaryResponse, status_code=status.HTTP_200_OK, summary="Получить сводку магазина")
+def read_store_summary(store_id: int, db: Session = Depends(get_db)):
+    """
+    Получить сводку магазина: количество продуктов, разбивку по брендам,
+    выручку и количество недавних событий.
+
+    Сводка кэшируется и сбрасывается при изменении продуктов, платежей
+    и статистики магазина.
+
+    Параметры:
+    - store_id (int): ID магазина.
+
+    Возвращает:
+    - StoreSummaryResponse: Сводка магазина.
+    """
+    try:
+        if store_id not in current_catalog().stores and db.query(Store.id).filter(Store.id == store_id).first() is None:
+            raise HTTPException(status_code=404, detail="Магазин не найден")
+        return get_store_summary(db, store_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении сводки магазина - " + str(e))
+
+
 @stores.put("/{store_id}", response_model=StoreResponse, status_code=status.HTTP_200_OK, summary="Обновить магазин по ID")
 def update_store(store_id: int, store: StoreCreate, db: Session = Depends(get_db)):
     """
@@ -69,8 +130,10 @@ def update_store(store_id: int, store: StoreCreate, db: Session = Depends(get_db
             raise HTTPException(status_code=404, detail="Магазин не найден")
         for attr, value in store.dict().items():
             setattr(db_store, attr, value)
+        db_store.version += 1
         db.commit()
         db.refresh(db_store)
+        refresh_catalog(db, brands=False, products=False)
         return db_store
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении магазина - " + str(e))
@@ -93,6 +156,8 @@ def delete_store(store_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Магазин не найден")
         db.delete(db_store)
         db.commit()
+        refresh_catalog(db, brands=False, products=False)
+        invalidate_store_summary(store_id)
         return db_store
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при удалении магазина - " + str(e))
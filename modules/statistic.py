@@ -1,17 +1,69 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from models.models import Statistic
-from models.schemas import StatisticCreate, StatisticResponse
-from database import get_db
+from models.schemas import StatisticCreate, StatisticResponse, StatisticCount, RetentionResponse
+from database import (get_db, statistic_engines, statistic_session, statistic_shard, statistic_write_locks,
+                      encode_statistic_id, decode_statistic_id)
+from retention import RetentionInProgress, aggregate_counts, archive_statistics, read_archive, retention_run
+from store_summary import invalidate_store_summary
+from http_cache import row_etag, cache_headers, is_not_modified, not_modified_response
 
 statistics = APIRouter()
 
+# Пул для параллельного опроса шардов
+_shard_pool = ThreadPoolExecutor(max_workers=len(statistic_engines), thread_name_prefix="statistic-shard")
+
+
+# Ответ с глобальным ID статистики
+def _to_response(db_statistic: Statistic, shard: int) -> StatisticResponse:
+    return StatisticResponse(
+        id=encode_statistic_id(db_statistic.id, shard),
+        event_type=db_statistic.event_type,
+        event_time=db_statistic.event_time,
+        user_id=db_statistic.user_id,
+        product_id=db_statistic.product_id,
+        store_id=db_statistic.store_id,
+    )
+
+
+def _insert_statistic(data: dict) -> StatisticResponse:
+    shard = statistic_shard(data["store_id"])
+    with statistic_session(shard) as db, statistic_write_locks[shard]:
+        db_statistic = Statistic(**data)
+        db.add(db_statistic)
+        db.commit()
+        db.refresh(db_statistic)
+        invalidate_store_summary(db_statistic.store_id)
+        return _to_response(db_statistic, shard)
+
+
+def _count_shard(shard: int, start: Optional[datetime], end: Optional[datetime],
+                 event_type: Optional[str], store_id: Optional[int]) -> list:
+    with statistic_session(shard) as db:
+        query = db.query(Statistic.event_type, Statistic.store_id, func.count(Statistic.id))
+        if start is not None:
+            query = query.filter(Statistic.event_time >= start)
+        if end is not None:
+            query = query.filter(Statistic.event_time < end)
+        if event_type is not None:
+            query = query.filter(Statistic.event_type == event_type)
+        if store_id is not None:
+            query = query.filter(Statistic.store_id == store_id)
+        return query.group_by(Statistic.event_type, Statistic.store_id).all()
+
+
 # Маршруты для сущности Statistic
 
 
 @statistics.post("/", response_model=StatisticResponse, status_code=status.HTTP_201_CREATED, summary="Создать новую статистику")
-def create_statistic(statistic: StatisticCreate, db: Session = Depends(get_db)):
+def create_statistic(statistic: StatisticCreate):
     """
     Создать новую статистику.
 
@@ -22,17 +74,110 @@ def create_statistic(statistic: StatisticCreate, db: Session = Depends(get_db)):
     - StatisticResponse: Созданная статистика.
     """
     try:
-        db_statistic = Statistic(**statistic.dict())
-        db.add(db_statistic)
-        db.commit()
-        db.refresh(db_statistic)
-        return db_statistic
+        return _insert_statistic(statistic.dict())
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании статистики - " + str(e))
 
 
+@statistics.post("/retention", response_model=RetentionResponse, status_code=status.HTTP_200_OK, summary="Перенести старую статистику в архив")
+def run_retention(older_than_days: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Перенести старую статистику в архив.
+
+    Шарды обрабатываются по очереди, агрегаты сохраняются в основной базе.
+    Если перенос уже выполняется, возвращается 409.
+
+    Параметры:
+    - older_than_days (int): Возраст событий в днях (по умолчанию из настроек).
+
+    Возвращает:
+    - RetentionResponse: Результат переноса.
+    """
+    try:
+        archived = 0
+        partitions = set()
+        cutoff = None
+        with retention_run():
+            for shard in range(len(statistic_engines)):
+                with statistic_session(shard) as shard_db:
+                    result = archive_statistics(shard_db, aggregates_db=db, shard=shard,
+                                                older_than_days=older_than_days)
+                archived += result["archived"]
+                partitions.update(result["partitions"])
+                cutoff = result["cutoff"]
+        return {"archived": archived, "cutoff": cutoff, "partitions": sorted(partitions)}
+    except RetentionInProgress:
+        raise HTTPException(status_code=409, detail="Перенос статистики уже выполняется")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при архивации статистики - " + str(e))
+
+
+@statistics.get("/archive", response_model=List[StatisticResponse], status_code=status.HTTP_200_OK, summary="Получить архивную статистику за период")
+def read_archived_statistics(start: datetime, end: datetime, event_type: Optional[str] = None,
+                             store_id: Optional[int] = None, limit: int = 1000):
+    """
+    Получить архивную статистику за период.
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - event_type (str): Фильтр по типу события.
+    - store_id (int): Фильтр по магазину.
+    - limit (int): Максимальное количество событий.
+
+    Возвращает:
+    - List[StatisticResponse]: Архивные события.
+    """
+    try:
+        return read_archive(start, end, event_type=event_type, store_id=store_id, limit=limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при чтении архива статистики - " + str(e))
+
+
+@statistics.get("/counts", response_model=List[StatisticCount], status_code=status.HTTP_200_OK, summary="Получить количество событий")
+def count_statistics(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     event_type: Optional[str] = None, store_id: Optional[int] = None,
+                     db: Session = Depends(get_db)):
+    """
+    Получить количество событий по типам и магазинам.
+
+    Запрос по магазину читает один шард, остальные запросы
+    выполняются параллельно по всем шардам с объединением результатов.
+    К ним добавляются дневные агрегаты событий, перенесенных в архив
+    (день учитывается целиком, если его начало входит в период).
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - event_type (str): Фильтр по типу события.
+    - store_id (int): Фильтр по магазину.
+
+    Возвращает:
+    - List[StatisticCount]: Количество событий.
+    """
+    try:
+        if store_id is not None:
+            shards = [statistic_shard(store_id)]
+        else:
+            shards = range(len(statistic_engines))
+        futures = [_shard_pool.submit(_count_shard, shard, start, end, event_type, store_id) for shard in shards]
+
+        counts = Counter()
+        for row_event_type, row_store_id, count in aggregate_counts(db, start, end, event_type, store_id):
+            counts[(row_event_type, row_store_id)] += count
+        for future in futures:
+            for row_event_type, row_store_id, count in future.result():
+                counts[(row_event_type, row_store_id)] += count
+        return [
+            StatisticCount(event_type=row_event_type, store_id=row_store_id, count=count)
+            for (row_event_type, row_store_id), count in sorted(counts.items(), key=lambda item: -item[1])
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при подсчете статистики - " + str(e))
+
+
 @statistics.get("/{statistic_id}", response_model=StatisticResponse, status_code=status.HTTP_200_OK, summary="Получить статистику по ID")
-def read_statistic(statistic_id: int, db: Session = Depends(get_db)):
+def read_statistic(statistic_id: int, request: Request, response: Response):
     """
     Получить статистику по ID.
 
@@ -43,19 +188,30 @@ def read_statistic(statistic_id: int, db: Session = Depends(get_db)):
     - StatisticResponse: Полученная статистика.
     """
     try:
-        db_statistic = db.query(Statistic).filter(Statistic.id == statistic_id).first()
-        if db_statistic is None:
-            raise HTTPException(status_code=404, detail="Статистика не найдена")
-        return db_statistic
+        local_id, shard = decode_statistic_id(statistic_id)
+        with statistic_session(shard) as db:
+            db_statistic = db.query(Statistic).filter(Statistic.id == local_id).first()
+            if db_statistic is None:
+                raise HTTPException(status_code=404, detail="Статистика не найдена")
+            headers = cache_headers(row_etag("statistic", statistic_id, db_statistic.version), db_statistic.updated_at)
+            if is_not_modified(request, headers["ETag"], db_statistic.updated_at):
+                return not_modified_response(headers)
+            response.headers.update(headers)
+            return _to_response(db_statistic, shard)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении статистики - " + str(e))
 
 
 @statistics.put("/{statistic_id}", response_model=StatisticResponse, status_code=status.HTTP_200_OK, summary="Обновить статистику по ID")
-def update_statistic(statistic_id: int, statistic: StatisticCreate, db: Session = Depends(get_db)):
+def update_statistic(statistic_id: int, statistic: StatisticCreate):
     """
     Обновить статистику по ID.
 
+    Если новый магазин относится к другому шарду, запись переносится
+    в него и получает новый ID. Перенос выполняется «не менее одного раза»:
+    запись сначала создается в новом шарде, затем удаляется из старого,
+    поэтому при сбое между шагами событие может остаться в обоих шардах.
+
     Параметры:
     - statistic_id (int): ID статистики для обновления.
     - statistic: StatisticCreate - Обновленные данные статистики.
@@ -64,20 +220,37 @@ def update_statistic(statistic_id: int, statistic: StatisticCreate, db: Session
     - StatisticResponse: Обновленная статистика.
     """
     try:
-        db_statistic = db.query(Statistic).filter(Statistic.id == statistic_id).first()
-        if db_statistic is None:
-            raise HTTPException(status_code=404, detail="Статистика не найдена")
-        for attr, value in statistic.dict().items():
-            setattr(db_statistic, attr, value)
-        db.commit()
-        db.refresh(db_statistic)
-        return db_statistic
+        local_id, shard = decode_statistic_id(statistic_id)
+        if statistic_shard(statistic.store_id) != shard:
+            # Блокировки шардов берутся по очереди, чтобы встречные переносы не ждали друг друга
+            with statistic_session(shard) as db:
+                db_statistic = db.query(Statistic).filter(Statistic.id == local_id).first()
+                if db_statistic is None:
+                    raise HTTPException(status_code=404, detail="Статистика не найдена")
+                moved = _insert_statistic(statistic.dict())
+                with statistic_write_locks[shard]:
+                    db.delete(db_statistic)
+                    db.commit()
+                invalidate_store_summary(db_statistic.store_id)
+                return moved
+        with statistic_session(shard) as db, statistic_write_locks[shard]:
+            db_statistic = db.query(Statistic).filter(Statistic.id == local_id).first()
+            if db_statistic is None:
+                raise HTTPException(status_code=404, detail="Статистика не найдена")
+            previous_store_id = db_statistic.store_id
+            for attr, value in statistic.dict().items():
+                setattr(db_statistic, attr, value)
+            db_statistic.version += 1
+            db.commit()
+            db.refresh(db_statistic)
+            invalidate_store_summary(previous_store_id, db_statistic.store_id)
+            return _to_response(db_statistic, shard)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении статистики - " + str(e))
 
 
 @statistics.delete("/{statistic_id}", response_model=StatisticResponse, status_code=status.HTTP_200_OK, summary="Удалить статистику по ID")
-def delete_statistic(statistic_id: int, db: Session = Depends(get_db)):
+def delete_statistic(statistic_id: int):
     """
     Удалить статистику по ID.
 
@@ -88,11 +261,15 @@ def delete_statistic(statistic_id: int, db: Session = Depends(get_db)):
     - StatisticResponse: Удаленная статистика.
     """
     try:
-        db_statistic = db.query(Statistic).filter(Statistic.id == statistic_id).first()
-        if db_statistic is None:
-            raise HTTPException(status_code=404, detail="Статистика не найдена")
-        db.delete(db_statistic)
-        db.commit()
-        return db_statistic
+        local_id, shard = decode_statistic_id(statistic_id)
+        with statistic_session(shard) as db, statistic_write_locks[shard]:
+            db_statistic = db.query(Statistic).filter(Statistic.id == local_id).first()
+            if db_statistic is None:
+                raise HTTPException(status_code=404, detail="Статистика не найдена")
+            response = _to_response(db_statistic, shard)
+            db.delete(db_statistic)
+            db.commit()
+            invalidate_store_summary(response.store_id)
+            return response
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при удалении статистики - " + str(e))
@@ -1,20 +1,52 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
-from models.schemas import UserCreate, UserResponse
+from models.schemas import UserCreate, UserLogin, UserResponse
 from database import get_db
+from http_cache import row_etag, cache_headers, is_not_modified, not_modified_response
 from models.models import User
+from security import hash_password, verify_password
 
 users = APIRouter()
 
+
+# Работа с базой выполняется в пуле потоков, хеширование — в пуле процессов
+def _get_user(db: Session, user_id: int):
+    return db.query(User).filter(User.id == user_id).first()
+
+
+def _find_user(db: Session, username: str):
+    return db.query(User).filter(User.username == username).first()
+
+
+def _add_user(db: Session, data: dict) -> User:
+    db_user = User(**data)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
+def _update_user(db: Session, db_user: User, data: dict) -> User:
+    for attr, value in data.items():
+        setattr(db_user, attr, value)
+    db_user.version += 1
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+
 # Маршруты для сущности User
 
 
 @users.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED, summary="Создать пользователя")
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """
     Создать нового пользователя.
 
+    Пароль хешируется на сервере в пуле процессов.
+
     Параметры:
     - user: UserCreate - Данные для создания пользователя.
 
@@ -23,21 +55,42 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """
     try:
         # Проверка уникальности имени пользователя
-        existing_user = db.query(User).filter(User.username == user.username).first()
+        existing_user = await run_in_threadpool(_find_user, db, user.username)
         if existing_user:
             raise HTTPException(status_code=400, detail="Имя пользователя уже занято")
 
-        db_user = User(**user.dict())
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
-        return db_user
+        data = user.dict(exclude={"password"})
+        data["password_hash"] = await hash_password(user.password)
+        return await run_in_threadpool(_add_user, db, data)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при создании пользователя -  " + str(e))
 
 
+@users.post("/login", response_model=UserResponse, status_code=status.HTTP_200_OK, summary="Проверить имя пользователя и пароль")
+async def login_user(credentials: UserLogin, db: Session = Depends(get_db)):
+    """
+    Проверить имя пользователя и пароль.
+
+    Параметры:
+    - credentials: UserLogin - Имя пользователя и пароль.
+
+    Возвращает:
+    - UserResponse: Пользователь, если пароль верный.
+    """
+    try:
+        db_user = await run_in_threadpool(_find_user, db, credentials.username)
+        password_hash = db_user.password_hash if db_user is not None else None
+        if not await verify_password(credentials.password, password_hash):
+            raise HTTPException(status_code=401, detail="Неверное имя пользователя или пароль")
+        return db_user
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Произошла ошибка при проверке пароля - " + str(e))
+
+
 @users.get("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK, summary="Получить пользователя по ID")
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     """
     Получить пользователя по ID.
 
@@ -51,16 +104,22 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
         db_user = db.query(User).filter(User.id == user_id).first()
         if db_user is None:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
+        headers = cache_headers(row_etag("user", db_user.id, db_user.version), db_user.updated_at)
+        if is_not_modified(request, headers["ETag"], db_user.updated_at):
+            return not_modified_response(headers)
+        response.headers.update(headers)
         return db_user
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при чтении пользователя - " + str(e))
 
 
 @users.put("/{user_id}", response_model=UserResponse, status_code=status.HTTP_200_OK, summary="Обновить пользователя по ID")
-def update_user(user_id: int, user: UserCreate, db: Session = Depends(get_db)):
+async def update_user(user_id: int, user: UserCreate, db: Session = Depends(get_db)):
     """
     Обновить пользователя по ID.
 
+    Новый пароль хешируется на сервере в пуле процессов.
+
     Параметры:
     - user_id (int): ID пользователя для обновления.
     - user: UserCreate - Обновленные данные пользователя.
@@ -69,14 +128,12 @@ def update_user(user_id: int, user: UserCreate, db: Session = Depends(get_db)):
     - UserResponse: Обновленный пользователь.
     """
     try:
-        db_user = db.query(User).filter(User.id == user_id).first()
+        db_user = await run_in_threadpool(_get_user, db, user_id)
         if db_user is None:
             raise HTTPException(status_code=404, detail="Пользователь не найден")
-        for attr, value in user.dict().items():
-            setattr(db_user, attr, value)
-        db.commit()
-        db.refresh(db_user)
-        return db_user
+        data = user.dict(exclude={"password"})
+        data["password_hash"] = await hash_password(user.password)
+        return await run_in_threadpool(_update_user, db, db_user, data)
     except Exception as e:
         raise HTTPException(status_code=500, detail="Произошла ошибка при обновлении пользователя - " + str(e))
 
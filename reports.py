@@ -0,0 +1,264 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from database import engine, statistic_engines, statistic_shard
+from retention import aggregate_days
+
+# Настройки фоновых отчетов (переопределяются переменными окружения)
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_CHUNK_SIZE = int(os.getenv("REPORT_CHUNK_SIZE", "50000"))
+REPORT_RESULT_TTL = float(os.getenv("REPORT_RESULT_TTL", "600"))
+REPORT_MAX_PENDING = int(os.getenv("REPORT_MAX_PENDING", "16"))
+REPORT_MAX_JOBS = int(os.getenv("REPORT_MAX_JOBS", "256"))
+
+# Шаг гистограммы -> частота pandas
+HISTOGRAM_BUCKETS = {"hour": "h", "day": "D"}
+
+
+class ReportQueueFull(Exception):
+    """
+    Очередь отчетов заполнена.
+    """
+
+
+class ReportJob:
+    """
+    Задание на построение отчета.
+    """
+
+    def __init__(self, kind: str, params: dict, key: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.key = key
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.finished_at = None
+        self.expires_at = None
+
+
+_jobs = {}
+_jobs_by_key = {}
+_jobs_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+        return _pool
+
+
+# Соединение только для чтения с файлом SQLite движка. Отчет читается
+# в одной транзакции: в режиме WAL это снимок базы, запись не ждет чтения
+def _readonly_connection(db_engine) -> sqlite3.Connection:
+    path = os.path.abspath(db_engine.url.database)
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False, isolation_level=None)
+    conn.execute("BEGIN")
+    return conn
+
+
+def _sql_time(moment: datetime) -> str:
+    # SQLAlchemy хранит DateTime в SQLite строкой вида "YYYY-MM-DD HH:MM:SS.ffffff" без часового пояса в UTC
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat(sep=" ", timespec="microseconds")
+
+
+def revenue_by_brand(start: datetime, end: datetime, store_id: int = None, **_) -> pd.DataFrame:
+    """
+    Выручка по брендам за период.
+
+    Платежи читаются порциями, каждая порция агрегируется векторно,
+    частичные итоги складываются.
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - store_id (int): Фильтр по магазину.
+
+    Возвращает:
+    - DataFrame: brand_id, brand_name, revenue, payments.
+    """
+    sql = "SELECT product_id, amount FROM payments WHERE created_at >= ? AND created_at < ?"
+    params = [_sql_time(start), _sql_time(end)]
+    if store_id is not None:
+        sql += " AND store_id = ?"
+        params.append(store_id)
+
+    with closing(_readonly_connection(engine)) as conn:
+        brands = pd.read_sql_query(
+            "SELECT p.id AS product_id, p.brand_id, b.name AS brand_name "
+            "FROM products p LEFT JOIN brands b ON b.id = p.brand_id", conn, index_col="product_id")
+        totals = None
+        for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=REPORT_CHUNK_SIZE):
+            chunk["brand_id"] = chunk["product_id"].map(brands["brand_id"])
+            partial = chunk.groupby("brand_id", dropna=False)["amount"].agg(["sum", "count"])
+            totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame(columns=["brand_id", "brand_name", "revenue", "payments"])
+    names = brands.drop_duplicates("brand_id").set_index("brand_id")["brand_name"]
+    result = totals.rename(columns={"sum": "revenue", "count": "payments"}).reset_index()
+    result["brand_name"] = result["brand_id"].map(names)
+    result["brand_id"] = result["brand_id"].astype("Int64")
+    result["payments"] = result["payments"].astype("int64")
+    return result[["brand_id", "brand_name", "revenue", "payments"]].sort_values("revenue", ascending=False)
+
+
+def store_event_histogram(start: datetime, end: datetime, store_id: int = None, event_type: str = None,
+                          bucket: str = "day", **_) -> pd.DataFrame:
+    """
+    Гистограмма событий по магазинам за период.
+
+    Запрос по магазину читает один шард статистики, иначе все шарды.
+    Дневная гистограмма учитывает и дневные агрегаты событий,
+    перенесенных в архив; для часовой они слишком грубые.
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - store_id (int): Фильтр по магазину.
+    - event_type (str): Фильтр по типу события.
+    - bucket (str): Шаг гистограммы (hour или day).
+
+    Возвращает:
+    - DataFrame: store_id, bucket, event_type, count.
+    """
+    sql = "SELECT store_id, event_type, event_time FROM statistics WHERE event_time >= ? AND event_time < ?"
+    params = [_sql_time(start), _sql_time(end)]
+    if store_id is not None:
+        sql += " AND store_id = ?"
+        params.append(store_id)
+    if event_type is not None:
+        sql += " AND event_type = ?"
+        params.append(event_type)
+
+    shards = [statistic_engines[statistic_shard(store_id)]] if store_id is not None else statistic_engines
+    totals = None
+    for shard_engine in shards:
+        with closing(_readonly_connection(shard_engine)) as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=REPORT_CHUNK_SIZE):
+                chunk["bucket"] = pd.to_datetime(chunk["event_time"]).dt.floor(HISTOGRAM_BUCKETS[bucket])
+                partial = chunk.groupby(["store_id", "bucket", "event_type"]).size()
+                totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if bucket == "day":
+        first, last = aggregate_days(start, end)
+        sql = "SELECT store_id, event_type, day, count FROM statistic_aggregates WHERE day >= ? AND day < ?"
+        params = [first.isoformat(), last.isoformat()]
+        if store_id is not None:
+            sql += " AND store_id = ?"
+            params.append(store_id)
+        if event_type is not None:
+            sql += " AND event_type = ?"
+            params.append(event_type)
+        with closing(_readonly_connection(engine)) as conn:
+            for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=REPORT_CHUNK_SIZE):
+                chunk["bucket"] = pd.to_datetime(chunk["day"])
+                partial = chunk.groupby(["store_id", "bucket", "event_type"])["count"].sum()
+                totals = partial if totals is None else totals.add(partial, fill_value=0)
+
+    if totals is None:
+        return pd.DataFrame(columns=["store_id", "bucket", "event_type", "count"])
+    result = totals.astype("int64").rename("count").reset_index()
+    result["bucket"] = result["bucket"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    return result.sort_values(["store_id", "bucket", "event_type"])
+
+
+REPORTS = {
+    "revenue_by_brand": revenue_by_brand,
+    "store_event_histogram": store_event_histogram,
+}
+
+
+def _run_job(job: ReportJob):
+    job.status = "running"
+    try:
+        job.result = REPORTS[job.kind](**job.params)
+        job.status = "done"
+    except Exception as e:
+        job.error = str(e)
+        job.status = "failed"
+    job.finished_at = datetime.utcnow()
+    job.expires_at = time.monotonic() + REPORT_RESULT_TTL
+
+
+def _drop_job(job: ReportJob):
+    del _jobs[job.id]
+    if _jobs_by_key.get(job.key) is job:
+        del _jobs_by_key[job.key]
+
+
+def _drop_expired(now: float):
+    for job in [job for job in _jobs.values() if job.expires_at is not None and job.expires_at <= now]:
+        _drop_job(job)
+    # Сверх лимита удаляются самые старые готовые задания, не дожидаясь TTL
+    finished = [job for job in _jobs.values() if job.expires_at is not None]
+    for job in finished[:max(0, len(_jobs) - REPORT_MAX_JOBS)]:
+        _drop_job(job)
+
+
+def submit_report(kind: str, params: dict) -> ReportJob:
+    """
+    Поставить отчет в очередь.
+
+    Задание с теми же параметрами переиспользуется, пока его результат
+    не устарел (неудачные задания запускаются заново). Если в очереди
+    и в работе уже REPORT_MAX_PENDING заданий, новое не принимается.
+
+    Параметры:
+    - kind (str): Тип отчета.
+    - params (dict): Параметры отчета.
+
+    Возвращает:
+    - ReportJob: Задание.
+    """
+    key = kind + ":" + json.dumps(params, sort_keys=True, default=str)
+    with _jobs_lock:
+        _drop_expired(time.monotonic())
+        job = _jobs_by_key.get(key)
+        if job is not None and job.status != "failed":
+            return job
+        if sum(job.status in ("queued", "running") for job in _jobs.values()) >= REPORT_MAX_PENDING:
+            raise ReportQueueFull()
+        job = ReportJob(kind, params, key)
+        _jobs[job.id] = job
+        _jobs_by_key[key] = job
+    _get_pool().submit(_run_job, job)
+    return job
+
+
+def get_report_job(job_id: str):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+# Остановка пула при завершении приложения: задания из очереди отменяются
+def shutdown_report_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+    with _jobs_lock:
+        for job in _jobs.values():
+            if job.status == "queued":
+                job.status = "failed"
+                job.error = "Сервер остановлен"
+                job.finished_at = datetime.utcnow()
+                job.expires_at = time.monotonic()
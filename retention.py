@@ -0,0 +1,320 @@
+import gzip
+import json
+import os
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database import encode_statistic_id, statistic_write_locks
+from models.models import Statistic, StatisticAggregate, StatisticRetentionState
+
+# Настройки хранения статистики (переопределяются переменными окружения)
+STATISTICS_RETENTION_DAYS = int(os.getenv("STATISTICS_RETENTION_DAYS", "90"))
+STATISTICS_RETENTION_BATCH = int(os.getenv("STATISTICS_RETENTION_BATCH", "5000"))
+STATISTICS_ARCHIVE_DIR = os.getenv("STATISTICS_ARCHIVE_DIR", "./archive/statistics")
+STATISTICS_VACUUM_PAGES = int(os.getenv("STATISTICS_VACUUM_PAGES", "1000"))
+
+# Одновременно выполняется только один перенос (RLock: перенос всех шардов включает перенос каждого)
+_retention_lock = threading.RLock()
+
+
+class RetentionInProgress(Exception):
+    """
+    Перенос статистики уже выполняется.
+    """
+
+
+@contextmanager
+def retention_run():
+    if not _retention_lock.acquire(blocking=False):
+        raise RetentionInProgress()
+    try:
+        yield
+    finally:
+        _retention_lock.release()
+
+
+# Имя файла архивной партиции (одна партиция на месяц)
+def _partition_path(moment: datetime) -> str:
+    return os.path.join(STATISTICS_ARCHIVE_DIR, moment.strftime("%Y-%m") + ".jsonl.gz")
+
+
+# Время событий хранится без часового пояса в UTC
+def _naive_utc(moment: datetime) -> datetime:
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _row_to_dict(row: Statistic, shard: int) -> dict:
+    return {
+        "id": encode_statistic_id(row.id, shard),
+        "event_type": row.event_type,
+        "event_time": row.event_time.isoformat(),
+        "user_id": row.user_id,
+        "product_id": row.product_id,
+        "store_id": row.store_id,
+    }
+
+
+def _write_partitions(rows, shard: int) -> set:
+    """
+    Дописать события в сжатые архивные партиции.
+
+    Каждый вызов добавляет новый gzip-член в конец файла, поэтому
+    ранее записанные данные не переписываются.
+
+    Параметры:
+    - rows: Список событий Statistic.
+    - shard (int): Шард, из которого прочитаны события.
+
+    Возвращает:
+    - set: Пути затронутых партиций.
+    """
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(_partition_path(row.event_time), []).append(_row_to_dict(row, shard))
+
+    os.makedirs(STATISTICS_ARCHIVE_DIR, exist_ok=True)
+    for path, records in grouped.items():
+        payload = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                archive.write(payload.encode("utf-8"))
+            raw.flush()
+            os.fsync(raw.fileno())
+    return set(grouped)
+
+
+def _fold_aggregates(db: Session, rows):
+    """
+    Свернуть события в дневные агрегаты statistic_aggregates.
+
+    Счетчики увеличиваются одним UPSERT на ключ, без чтения в сессию.
+
+    Параметры:
+    - db: Сессия, в которой хранятся агрегаты.
+    - rows: Список событий Statistic.
+    """
+    counts = Counter(
+        (row.event_time.date(), row.event_type, row.store_id, row.product_id) for row in rows
+    )
+    if not counts:
+        return
+    statement = insert(StatisticAggregate)
+    statement = statement.on_conflict_do_update(
+        index_elements=["day", "event_type", "store_id", "product_id"],
+        set_={"count": StatisticAggregate.count + statement.excluded.count},
+    )
+    db.execute(statement, [
+        {"day": day, "event_type": event_type, "store_id": store_id, "product_id": product_id, "count": count}
+        for (day, event_type, store_id, product_id), count in counts.items()
+    ])
+
+
+def _finish_pending(db: Session, aggregates_db: Session, state: StatisticRetentionState):
+    """
+    Удалить из шарда пачку, уже свернутую в агрегаты, и снять отметку.
+
+    Удаляются ровно те ID, что попали в пачку, поэтому повторный вызов
+    после сбоя не затрагивает другие события. Вызывается под блокировкой
+    записи шарда.
+
+    Параметры:
+    - db: Сессия базы (шарда) со статистикой.
+    - aggregates_db: Сессия основной базы с отметкой.
+    - state: Отметка незавершенной пачки шарда.
+    """
+    if state.pending_ids is None:
+        return
+    ids = json.loads(state.pending_ids)
+    for start in range(0, len(ids), 500):
+        db.query(Statistic).filter(Statistic.id.in_(ids[start:start + 500])).delete(synchronize_session=False)
+    db.commit()
+    state.pending_ids = None
+    aggregates_db.commit()
+
+
+def compact(db: Session):
+    """
+    Освободить страницы после удаления и обновить статистику планировщика.
+
+    Инкрементальный VACUUM выполняется только для баз, созданных
+    с auto_vacuum = INCREMENTAL (см. init_db).
+
+    Параметры:
+    - db: Сессия базы данных.
+    """
+    if db.execute(text("PRAGMA auto_vacuum")).scalar() == 2:
+        db.execute(text(f"PRAGMA incremental_vacuum({STATISTICS_VACUUM_PAGES})"))
+    db.execute(text("ANALYZE statistics"))
+    db.commit()
+
+
+def archive_statistics(db: Session, aggregates_db: Session = None, shard: int = 0,
+                       older_than_days: int = None, batch_size: int = None) -> dict:
+    """
+    Перенести старые события из statistics в архив.
+
+    События старше заданного возраста пачками записываются в архивные
+    партиции, сворачиваются в агрегаты и удаляются из горячей таблицы.
+    Агрегаты фиксируются одной транзакцией с отметкой пачки в основной базе;
+    пачка, отмеченная до сбоя, при следующем запуске только удаляется
+    и повторно в агрегаты не попадает. Параллельный запуск отклоняется
+    исключением RetentionInProgress.
+
+    Параметры:
+    - db: Сессия базы (шарда) со статистикой.
+    - aggregates_db: Сессия основной базы с агрегатами (по умолчанию db).
+    - shard (int): Номер шарда статистики.
+    - older_than_days (int): Возраст событий в днях (по умолчанию STATISTICS_RETENTION_DAYS).
+    - batch_size (int): Размер пачки (по умолчанию STATISTICS_RETENTION_BATCH).
+
+    Возвращает:
+    - dict: Количество перенесенных событий и список затронутых партиций.
+    """
+    with retention_run():
+        return _archive_statistics(db, aggregates_db, shard, older_than_days, batch_size)
+
+
+def _archive_statistics(db: Session, aggregates_db: Session, shard: int, older_than_days: int,
+                        batch_size: int) -> dict:
+    older_than_days = STATISTICS_RETENTION_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or STATISTICS_RETENTION_BATCH
+    aggregates_db = db if aggregates_db is None else aggregates_db
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    state = aggregates_db.query(StatisticRetentionState).filter(StatisticRetentionState.shard == shard).first()
+    if state is None:
+        state = StatisticRetentionState(shard=shard)
+        aggregates_db.add(state)
+        aggregates_db.commit()
+    with statistic_write_locks[shard]:
+        _finish_pending(db, aggregates_db, state)
+
+    archived = 0
+    partitions = set()
+    while True:
+        # Пачка не меняется от выборки до удаления: запись в шард ждет блокировку
+        with statistic_write_locks[shard]:
+            rows = db.query(Statistic).filter(Statistic.event_time < cutoff) \
+                .order_by(Statistic.id).limit(batch_size).all()
+            if not rows:
+                break
+            partitions |= _write_partitions(rows, shard)
+            _fold_aggregates(aggregates_db, rows)
+            state.pending_ids = json.dumps([row.id for row in rows])
+            aggregates_db.commit()
+            for row in rows:
+                db.expunge(row)
+            _finish_pending(db, aggregates_db, state)
+        archived += len(rows)
+
+    if archived:
+        compact(db)
+    return {"archived": archived, "cutoff": cutoff, "partitions": sorted(os.path.basename(p) for p in partitions)}
+
+
+def read_archive(start: datetime, end: datetime, event_type: str = None, store_id: int = None,
+                 limit: int = 1000) -> list:
+    """
+    Прочитать архивные события за период.
+
+    Медленный путь: партиции читаются и распаковываются целиком.
+    Повторно записанные события (после прерванного переноса) отбрасываются
+    по полному совпадению записи: ID в SQLite переиспользуются после удаления.
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - event_type (str): Фильтр по типу события.
+    - store_id (int): Фильтр по магазину.
+    - limit (int): Максимальное количество событий.
+
+    Возвращает:
+    - list: События в виде словарей, упорядоченные по времени.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    result = []
+    seen = set()
+    month = datetime(start.year, start.month, 1)
+    while month < end and len(result) < limit:
+        path = _partition_path(month)
+        if os.path.exists(path):
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    record = json.loads(line)
+                    event_time = datetime.fromisoformat(record["event_time"])
+                    if not start <= event_time < end:
+                        continue
+                    if event_type is not None and record["event_type"] != event_type:
+                        continue
+                    if store_id is not None and record["store_id"] != store_id:
+                        continue
+                    identity = tuple(sorted(record.items()))
+                    if identity in seen:
+                        continue
+                    seen.add(identity)
+                    record["event_time"] = event_time
+                    result.append(record)
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+    result.sort(key=lambda record: record["event_time"])
+    return result[:limit]
+
+
+def aggregate_days(start: datetime = None, end: datetime = None) -> tuple:
+    """
+    Границы дней агрегатов для периода.
+
+    Агрегаты хранятся по дням, поэтому день учитывается целиком,
+    если его начало (00:00 UTC) входит в период.
+
+    Параметры:
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+
+    Возвращает:
+    - tuple: Первый день и день после последнего (None — без границы).
+    """
+    first = last = None
+    if start is not None:
+        start = _naive_utc(start)
+        first = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    if end is not None:
+        end = _naive_utc(end)
+        last = end.date() if end.time() == time.min else end.date() + timedelta(days=1)
+    return first, last
+
+
+def aggregate_counts(db: Session, start: datetime = None, end: datetime = None, event_type: str = None,
+                     store_id: int = None) -> list:
+    """
+    Количество архивных событий по типам и магазинам из дневных агрегатов.
+
+    Параметры:
+    - db: Сессия основной базы с агрегатами.
+    - start (datetime): Начало периода.
+    - end (datetime): Конец периода (не включительно).
+    - event_type (str): Фильтр по типу события.
+    - store_id (int): Фильтр по магазину.
+
+    Возвращает:
+    - list: Строки (тип события, ID магазина, количество).
+    """
+    first, last = aggregate_days(start, end)
+    query = db.query(StatisticAggregate.event_type, StatisticAggregate.store_id, func.sum(StatisticAggregate.count))
+    if first is not None:
+        query = query.filter(StatisticAggregate.day >= first)
+    if last is not None:
+        query = query.filter(StatisticAggregate.day < last)
+    if event_type is not None:
+        query = query.filter(StatisticAggregate.event_type == event_type)
+    if store_id is not None:
+        query = query.filter(StatisticAggregate.store_id == store_id)
+    return query.group_by(StatisticAggregate.event_type, StatisticAggregate.store_id).all()
@@ -0,0 +1,116 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Настройки хеширования паролей (переопределяются переменными окружения)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+PASSWORD_SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", "16384"))
+PASSWORD_SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+PASSWORD_SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = None
+_dummy_hash = None
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r * p, dklen=32)
+
+
+# Выполняются в процессах пула, поэтому объявлены на уровне модуля
+def _hash(password: str, n: int, r: int, p: int) -> str:
+    salt = os.urandom(16)
+    digest = _scrypt(password, salt, n, r, p)
+    return "scrypt${}${}${}${}${}".format(
+        n, r, p, base64.b64encode(salt).decode("ascii"), base64.b64encode(digest).decode("ascii"))
+
+
+def _verify(password: str, encoded: str) -> bool:
+    try:
+        scheme, n, r, p, salt, digest = encoded.split("$")
+    except (AttributeError, ValueError):
+        return False
+    if scheme != "scrypt":
+        return False
+    expected = base64.b64decode(digest)
+    return hmac.compare_digest(_scrypt(password, base64.b64decode(salt), int(n), int(r), int(p)), expected)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # spawn: fork многопоточного процесса (пул потоков uvicorn, пулы шардов и отчетов) может зависнуть
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                        mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+# Запуск пула и подготовка фиктивного хеша при старте приложения
+def start_password_pool():
+    global _dummy_hash
+    _get_pool()
+    if _dummy_hash is None:
+        _dummy_hash = _hash(os.urandom(16).hex(), PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+
+
+async def _run(func, *args):
+    # Ограничение очереди: лишние запросы ждут в event loop, не занимая потоки
+    global _pending
+    if _pending is None:
+        _pending = asyncio.Semaphore(PASSWORD_HASH_MAX_PENDING)
+    async with _pending:
+        return await asyncio.get_running_loop().run_in_executor(_get_pool(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    """
+    Захешировать пароль в пуле процессов.
+
+    Параметры:
+    - password (str): Пароль в открытом виде.
+
+    Возвращает:
+    - str: Хеш в формате scrypt$N$r$p$соль$хеш.
+    """
+    return await _run(_hash, password, PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P)
+
+
+async def verify_password(password: str, encoded: str = None) -> bool:
+    """
+    Проверить пароль по сохраненному хешу в пуле процессов.
+
+    Без хеша (неизвестный пользователь или старая запись) пароль проверяется
+    по фиктивному хешу, чтобы время ответа не выдавало существующие имена.
+
+    Параметры:
+    - password (str): Пароль в открытом виде.
+    - encoded (str): Сохраненный хеш.
+
+    Возвращает:
+    - bool: True, если пароль совпадает.
+    """
+    global _dummy_hash
+    if not encoded or not encoded.startswith("scrypt$"):
+        if _dummy_hash is None:
+            _dummy_hash = await hash_password(os.urandom(16).hex())
+        await _run(_verify, password, _dummy_hash)
+        return False
+    return await _run(_verify, password, encoded)
+
+
+# Остановка пула при завершении приложения
+def shutdown_password_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, literal, null, select, union_all
+from sqlalchemy.orm import Session
+
+from database import statistic_session, statistic_shard
+from models.models import Brand, Payment, Product, Statistic
+
+# Настройки кэша сводки магазина
+STORE_SUMMARY_TTL = float(os.getenv("STORE_SUMMARY_TTL", "60"))
+STORE_SUMMARY_EVENTS_HOURS = int(os.getenv("STORE_SUMMARY_EVENTS_HOURS", "24"))
+
+# store_id -> (время истечения, сводка) и счетчики инвалидаций
+_cache = {}
+_generations = {}
+_cache_lock = threading.Lock()
+
+
+def invalidate_store_summary(*store_ids):
+    """
+    Сбросить кэшированную сводку магазинов.
+
+    Параметры:
+    - store_ids: ID магазинов (None пропускаются).
+    """
+    with _cache_lock:
+        for store_id in store_ids:
+            if store_id is None:
+                continue
+            _cache.pop(store_id, None)
+            _generations[store_id] = _generations.get(store_id, 0) + 1
+
+
+def _catalog_totals(db: Session, store_id: int) -> tuple:
+    # Один запрос: разбивка продуктов по брендам и итоги платежей
+    brands = select(
+        literal("brand").label("kind"), Product.brand_id.label("brand_id"), Brand.name.label("name"),
+        func.count(Product.id).label("count"), null().label("total"),
+    ).select_from(Product).outerjoin(Brand, Brand.id == Product.brand_id) \
+        .where(Product.store_id == store_id).group_by(Product.brand_id, Brand.name)
+    revenue = select(
+        literal("revenue"), null(), null(),
+        func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0.0),
+    ).where(Payment.store_id == store_id)
+
+    brand_rows = []
+    payments, total = 0, 0.0
+    for kind, brand_id, name, count, row_total in db.execute(union_all(brands, revenue)):
+        if kind == "brand":
+            brand_rows.append({"brand_id": brand_id, "name": name, "product_count": count})
+        else:
+            payments, total = count, float(row_total)
+    return brand_rows, payments, total
+
+
+def _event_counts(store_id: int, since: datetime) -> list:
+    # Статистика магазина целиком лежит в одном шарде
+    with statistic_session(statistic_shard(store_id)) as db:
+        rows = db.query(Statistic.event_type, func.count(Statistic.id)) \
+            .filter(Statistic.store_id == store_id, Statistic.event_time >= since) \
+            .group_by(Statistic.event_type).all()
+    return [{"event_type": event_type, "count": count} for event_type, count in rows]
+
+
+def compute_store_summary(db: Session, store_id: int) -> dict:
+    """
+    Посчитать сводку магазина двумя агрегатными запросами.
+
+    Параметры:
+    - db: Сессия базы данных.
+    - store_id (int): ID магазина.
+
+    Возвращает:
+    - dict: Количество продуктов, разбивка по брендам, выручка и недавние события.
+    """
+    brand_rows, payments, total = _catalog_totals(db, store_id)
+    events_since = datetime.utcnow() - timedelta(hours=STORE_SUMMARY_EVENTS_HOURS)
+    return {
+        "store_id": store_id,
+        "product_count": sum(row["product_count"] for row in brand_rows),
+        "brands": sorted(brand_rows, key=lambda row: -row["product_count"]),
+        "revenue": {
+            "payments": payments,
+            "total": total,
+            "average": total / payments if payments else 0.0,
+        },
+        "events_since": events_since,
+        "events": _event_counts(store_id, events_since),
+        "generated_at": datetime.utcnow(),
+    }
+
+
+def get_store_summary(db: Session, store_id: int) -> dict:
+    """
+    Получить сводку магазина из кэша или посчитать заново.
+
+    Результат не сохраняется, если во время расчета кэш магазина был сброшен.
+
+    Параметры:
+    - db: Сессия базы данных.
+    - store_id (int): ID магазина.
+
+    Возвращает:
+    - dict: Сводка магазина.
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(store_id)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        generation = _generations.get(store_id, 0)
+
+    summary = compute_store_summary(db, store_id)
+    with _cache_lock:
+        if _generations.get(store_id, 0) == generation:
+            _cache[store_id] = (now + STORE_SUMMARY_TTL, summary)
+    return summary
@@ -0,0 +1,73 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import get_db
+from main import app
+from models.models import Base, Statistic
+
+
+def _engine(path):
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+# Шарды статистики на временных базах: списки в database меняются на месте,
+# чтобы их видели все модули, импортировавшие их по имени
+@contextmanager
+def statistic_shards(engines):
+    lists = (database.statistic_engines, database.StatisticSessions, database.statistic_write_locks)
+    saved = [list(items) for items in lists]
+    database.statistic_engines[:] = engines
+    database.StatisticSessions[:] = [sessionmaker(autocommit=False, autoflush=False, bind=e) for e in engines]
+    database.statistic_write_locks[:] = [threading.Lock() for _ in engines]
+    try:
+        yield
+    finally:
+        for items, values in zip(lists, saved):
+            items[:] = values
+
+
+@contextmanager
+def _client(engine, shard_engines):
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        with statistic_shards(shard_engines):
+            yield TestClient(app)
+    finally:
+        app.dependency_overrides.clear()
+        for e in {engine, *shard_engines}:
+            e.dispose()
+
+
+# Клиент API с отдельной временной базой вместо shops.db
+@pytest.fixture
+def client(tmp_path):
+    engine = _engine(tmp_path / "test.db")
+    with _client(engine, [engine]) as test:
+        yield test
+
+
+
+# Клиент API со статистикой в двух временных шардах
+@pytest.fixture
+def sharded_client(tmp_path):
+    shard_engines = [_engine(tmp_path / f"statistics_{shard}.db") for shard in range(2)]
+    for shard_engine in shard_engines:
+        Statistic.__table__.create(bind=shard_engine)
+    with _client(_engine(tmp_path / "test.db"), shard_engines) as test:
+        yield test
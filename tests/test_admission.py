@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import admission
+from admission import ConcurrencyBudget, DatabaseLatency, Rejected, TokenBuckets
+
+
+def admission_client(monkeypatch, **settings):
+    for name, value in settings.items():
+        monkeypatch.setattr(admission, name, value)
+    app = FastAPI()
+
+    @app.get("/items")
+    def read_items():
+        return []
+
+    @app.post("/items")
+    def create_item():
+        return {}
+
+    app.add_middleware(admission.AdmissionMiddleware)
+    return TestClient(app)
+
+
+def test_empty_bucket_returns_429_with_retry_after(monkeypatch):
+    client = admission_client(monkeypatch, ADMISSION_RATE_PER_SECOND=0.5, ADMISSION_RATE_BURST=2)
+
+    assert [client.get("/items").status_code for _ in range(2)] == [200, 200]
+    response = client.get("/items")
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "2"
+
+
+def test_full_read_queue_returns_503(monkeypatch):
+    client = admission_client(monkeypatch, ADMISSION_MAX_READS=0, ADMISSION_READ_QUEUE=0)
+
+    response = client.get("/items")
+
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+    assert client.post("/items").status_code == 200
+
+
+def test_write_queue_timeout_returns_503(monkeypatch):
+    client = admission_client(monkeypatch, ADMISSION_MAX_WRITES=0, ADMISSION_WRITE_QUEUE=1,
+                              ADMISSION_QUEUE_TIMEOUT=0.05)
+
+    assert client.post("/items").status_code == 503
+    assert client.get("/items").status_code == 200
+
+
+def test_writes_are_shed_while_database_is_slow(monkeypatch):
+    latency = DatabaseLatency()
+    latency.observe(10)
+    monkeypatch.setattr(admission, "db_latency", latency)
+    client = admission_client(monkeypatch, ADMISSION_DB_LATENCY_LIMIT=0.5)
+
+    assert client.post("/items").status_code == 503
+    assert client.get("/items").status_code == 200
+
+
+def test_queued_request_runs_when_slot_is_released():
+    async def scenario():
+        budget = ConcurrencyBudget("чтение", 1, 1, 1)
+        await budget.acquire()
+        waiter = asyncio.ensure_future(budget.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected):
+            await budget.acquire()
+        budget.release()
+        await waiter
+        return budget.in_flight, budget.waiting
+
+    assert asyncio.run(scenario()) == (1, 0)
+
+
+def test_least_recently_seen_client_is_evicted():
+    buckets = TokenBuckets(rate=1, burst=5, max_clients=2)
+    for client in ("a", "b", "a", "c"):
+        buckets.take(client)
+
+    assert list(buckets.buckets) == ["a", "c"]
+
+
+def test_failed_query_does_not_leak_start_time():
+    engine = create_engine("sqlite://")
+    latency = DatabaseLatency()
+    latency.track(engine)
+    with engine.connect() as connection:
+        with pytest.raises(Exception):
+            connection.execute(text("SELECT * FROM missing"))
+        connection.execute(text("SELECT 1"))
+
+        assert connection.info["admission_started"] == []
+    engine.dispose()
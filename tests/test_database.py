@@ -0,0 +1,34 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from database import check_statistic_shards
+from models.models import Base, Statistic
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def test_shard_count_cannot_change(engine):
+    check_statistic_shards(engine, 2)
+    check_statistic_shards(engine, 2)
+
+    with pytest.raises(RuntimeError):
+        check_statistic_shards(engine, 4)
+    with pytest.raises(RuntimeError):
+        check_statistic_shards(engine, 0)
+
+
+def test_sharding_requires_empty_main_statistics(engine):
+    with Session(engine) as db:
+        db.add(Statistic(event_type="view", user_id=1, product_id=1, store_id=1))
+        db.commit()
+
+    with pytest.raises(RuntimeError):
+        check_statistic_shards(engine, 2)
+    check_statistic_shards(engine, 0)
@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+
+def test_store_list_etag_changes_after_delete_then_create(client):
+    for name in ("first", "second", "third"):
+        client.post("/stores/", json={"name": name, "description": None})
+    etag = client.get("/stores/").headers["etag"]
+
+    client.delete("/stores/3")
+    created = client.post("/stores/", json={"name": "DIFFERENT", "description": None}).json()
+    assert created["id"] == 3
+
+    response = client.get("/stores/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()[-1]["name"] == "DIFFERENT"
+
+
+def test_store_list_not_modified(client):
+    client.post("/stores/", json={"name": "first", "description": None})
+    etag = client.get("/stores/").headers["etag"]
+
+    response = client.get("/stores/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+def test_if_modified_since_is_not_fooled_by_same_second_update(client):
+    brand = client.post("/brands/", json={"name": "first", "description": None}).json()
+    last_modified = client.get(f"/brands/{brand['id']}").headers["last-modified"]
+    client.put(f"/brands/{brand['id']}", json={"name": "renamed", "description": None})
+
+    response = client.get(f"/brands/{brand['id']}", headers={"If-Modified-Since": last_modified})
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "renamed"
+
+
+def test_if_modified_since_after_last_change_returns_304(client):
+    brand = client.post("/brands/", json={"name": "first", "description": None}).json()
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=1), usegmt=True)
+
+    response = client.get(f"/brands/{brand['id']}", headers={"If-Modified-Since": later})
+
+    assert response.status_code == 304
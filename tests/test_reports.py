@@ -0,0 +1,80 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+import reports
+from database import _set_sqlite_pragmas
+from models.models import Base, Brand, Payment, Product
+
+
+def test_report_queue_is_bounded(client, monkeypatch):
+    monkeypatch.setattr(reports, "REPORT_MAX_PENDING", 0)
+
+    response = client.post("/reports/", json={"kind": "revenue_by_brand",
+                                              "start": "2024-01-01T00:00:00", "end": "2024-02-01T00:00:00"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+
+
+def test_sql_time_normalizes_aware_datetimes():
+    moment = datetime(2024, 1, 1, 3, 0, tzinfo=timezone(timedelta(hours=3)))
+
+    assert reports._sql_time(moment) == "2024-01-01 00:00:00.000000"
+
+
+def test_write_succeeds_while_report_is_reading(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'report.db'}", connect_args={"timeout": 0.2})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        db.add(Brand(id=1, name="brand"))
+        db.add(Product(id=1, name="product", brand_id=1))
+        db.add_all(Payment(amount=1.0, product_id=1, created_at=datetime(2024, 1, 1)) for _ in range(100))
+        db.commit()
+
+    read_sql_query = pd.read_sql_query
+    written = []
+
+    # После первой порции отчета в базу пишется новый платеж
+    def read_and_write(*args, **kwargs):
+        chunks = read_sql_query(*args, **kwargs)
+        if not kwargs.get("chunksize"):
+            return chunks
+
+        def generate():
+            for chunk in chunks:
+                yield chunk
+                if not written:
+                    with Session(engine) as db:
+                        db.add(Payment(amount=1.0, product_id=1, created_at=datetime(2024, 1, 2)))
+                        db.commit()
+                    written.append(True)
+        return generate()
+
+    monkeypatch.setattr(reports, "engine", engine)
+    monkeypatch.setattr(reports, "REPORT_CHUNK_SIZE", 10)
+    monkeypatch.setattr(reports.pd, "read_sql_query", read_and_write)
+
+    result = reports.revenue_by_brand(datetime(2024, 1, 1), datetime(2024, 2, 1))
+
+    assert written
+    # Отчет читает снимок на момент начала
+    assert result["payments"].tolist() == [100]
+    engine.dispose()
+
+
+def test_reports_run_after_pool_restart(monkeypatch):
+    monkeypatch.setitem(reports.REPORTS, "revenue_by_brand", lambda **_: pd.DataFrame({"revenue": [1.0]}))
+    reports.shutdown_report_pool()
+
+    job = reports.submit_report("revenue_by_brand", {"start": datetime(2024, 1, 1), "end": datetime(2024, 1, 2)})
+    for _ in range(100):
+        if job.status == "done":
+            break
+        time.sleep(0.01)
+
+    assert job.status == "done"
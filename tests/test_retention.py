@@ -0,0 +1,131 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import Session
+
+import retention
+from models.models import Base, Statistic, StatisticAggregate
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "STATISTICS_ARCHIVE_DIR", str(tmp_path / "archive"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'retention.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        yield session
+    engine.dispose()
+
+
+def add_events(db, count, days_ago=200, store_id=1, event_type="view"):
+    event_time = datetime.utcnow() - timedelta(days=days_ago)
+    db.add_all(Statistic(event_type=event_type, event_time=event_time, user_id=1, product_id=1, store_id=store_id)
+               for _ in range(count))
+    db.commit()
+
+
+def aggregate_total(db):
+    return db.query(func.coalesce(func.sum(StatisticAggregate.count), 0)).scalar()
+
+
+def test_fold_adds_to_existing_aggregates(db):
+    add_events(db, 3)
+    retention.archive_statistics(db, older_than_days=90)
+    add_events(db, 2)
+    retention.archive_statistics(db, older_than_days=90)
+
+    assert db.query(StatisticAggregate).count() == 1
+    assert aggregate_total(db) == 5
+
+
+def test_concurrent_retention_is_rejected(db, monkeypatch):
+    add_events(db, 10)
+    started, release = threading.Event(), threading.Event()
+    write_partitions = retention._write_partitions
+
+    # Первый перенос останавливается на записи архива
+    def slow_write(rows, shard):
+        started.set()
+        release.wait(5)
+        return write_partitions(rows, shard)
+
+    monkeypatch.setattr(retention, "_write_partitions", slow_write)
+    worker = threading.Thread(target=retention.archive_statistics, args=(db,), kwargs={"older_than_days": 90})
+    worker.start()
+    started.wait(5)
+    with pytest.raises(retention.RetentionInProgress):
+        retention.archive_statistics(db, older_than_days=90)
+    release.set()
+    worker.join()
+
+    assert aggregate_total(db) == 10
+    assert db.query(Statistic).count() == 0
+
+
+def test_retention_endpoint_returns_409_while_running(client):
+    with retention.retention_run():
+        response = client.post("/statistics/retention")
+
+    assert response.status_code == 409
+
+
+
+def test_replay_after_crash_deletes_only_the_batch(db, monkeypatch):
+    add_events(db, 2)
+    add_events(db, 1, days_ago=0)
+    add_events(db, 1)
+    finish_pending = retention._finish_pending
+
+    # Сбой после фиксации агрегатов, до удаления пачки из шарда
+    def crash(db, aggregates_db, state):
+        if state.pending_ids is not None:
+            raise RuntimeError("crash")
+
+    monkeypatch.setattr(retention, "_finish_pending", crash)
+    with pytest.raises(RuntimeError):
+        retention.archive_statistics(db, older_than_days=90)
+    db.rollback()
+    assert aggregate_total(db) == 3
+    assert db.query(Statistic).count() == 4
+
+    # Событие из середины диапазона ID пачки стало старым уже после сбоя
+    db.query(Statistic).filter(Statistic.id == 3).update(
+        {Statistic.event_time: datetime.utcnow() - timedelta(days=200)})
+    db.commit()
+
+    monkeypatch.setattr(retention, "_finish_pending", finish_pending)
+    result = retention.archive_statistics(db, older_than_days=90)
+
+    assert result["archived"] == 1
+    assert aggregate_total(db) == 4
+    assert db.query(Statistic).count() == 0
+
+
+def test_read_archive_drops_only_repeated_records(db):
+    add_events(db, 2)
+    rows = db.query(Statistic).all()
+    retention._write_partitions(rows, 0)
+    retention._write_partitions(rows, 0)
+    # ID переиспользован другим событием
+    rows[0].event_type = "click"
+    retention._write_partitions(rows[:1], 0)
+
+    records = retention.read_archive(datetime(2000, 1, 1), datetime.utcnow())
+
+    assert sorted((record["id"], record["event_type"]) for record in records) == [(1, "click"), (1, "view"), (2, "view")]
+
+
+def test_counts_include_archived_events(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(retention, "STATISTICS_ARCHIVE_DIR", str(tmp_path / "archive"))
+    old = (datetime.utcnow() - timedelta(days=200)).isoformat()
+    for event_time in (old, old, datetime.utcnow().isoformat()):
+        client.post("/statistics/", json={"event_type": "view", "event_time": event_time,
+                                          "user_id": 1, "product_id": 1, "store_id": 1})
+    before = client.get("/statistics/counts").json()
+
+    assert client.post("/statistics/retention").json()["archived"] == 2
+    assert client.get("/statistics/counts").json() == before == [{"event_type": "view", "store_id": 1, "count": 3}]
+    recent = client.get("/statistics/counts", params={"start": datetime.utcnow().date().isoformat()}).json()
+    assert recent == [{"event_type": "view", "store_id": 1, "count": 1}]
@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import database
+from database import decode_statistic_id, encode_statistic_id
+from models.models import Statistic
+
+
+def add_event(client, store_id, event_type="view"):
+    return client.post("/statistics/", json={"event_type": event_type, "event_time": datetime.utcnow().isoformat(),
+                                             "user_id": 1, "product_id": 1, "store_id": store_id}).json()
+
+
+def test_statistic_ids_encode_local_id_and_shard(sharded_client):
+    assert [encode_statistic_id(local_id, shard) for local_id, shard in [(1, 0), (1, 1), (2, 0)]] == [2, 3, 4]
+    assert [decode_statistic_id(statistic_id) for statistic_id in (2, 3, 4)] == [(1, 0), (1, 1), (2, 0)]
+
+    created = [add_event(sharded_client, store_id) for store_id in (1, 2, 3)]
+
+    assert [statistic["id"] for statistic in created] == [3, 2, 5]
+    assert [sharded_client.get(f"/statistics/{statistic['id']}").json()["store_id"] for statistic in created] == [1, 2, 3]
+
+
+def test_counts_fan_out_to_all_shards(sharded_client):
+    for store_id in (1, 2, 3, 3):
+        add_event(sharded_client, store_id)
+    with database.statistic_session(1) as db:
+        assert db.query(Statistic).count() == 3
+
+    counts = sharded_client.get("/statistics/counts").json()
+    assert sorted((row["store_id"], row["count"]) for row in counts) == [(1, 1), (2, 1), (3, 2)]
+    assert sharded_client.get("/statistics/counts", params={"store_id": 3}).json() == \
+        [{"event_type": "view", "store_id": 3, "count": 2}]
@@ -0,0 +1,17 @@
+def test_summary_of_missing_store_returns_404(client):
+    response = client.get("/stores/999/summary")
+    assert response.status_code == 404
+
+
+def test_summary_shows_renamed_and_deleted_brands(client):
+    store = client.post("/stores/", json={"name": "store", "description": None}).json()
+    brand = client.post("/brands/", json={"name": "old", "description": None}).json()
+    client.post("/products/", json={"name": "product", "description": None, "price": 1.0,
+                                    "store_id": store["id"], "brand_id": brand["id"]})
+    assert client.get(f"/stores/{store['id']}/summary").json()["brands"][0]["name"] == "old"
+
+    client.put(f"/brands/{brand['id']}", json={"name": "new", "description": None})
+    assert client.get(f"/stores/{store['id']}/summary").json()["brands"][0]["name"] == "new"
+
+    client.delete(f"/brands/{brand['id']}")
+    assert client.get(f"/stores/{store['id']}/summary").json()["brands"][0]["name"] is None
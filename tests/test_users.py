@@ -0,0 +1,6 @@
+def test_login_checks_password(client):
+    client.post("/users/", json={"username": "alice", "email": "alice@example.com", "password": "secret"})
+
+    assert client.post("/users/login", json={"username": "alice", "password": "secret"}).status_code == 200
+    assert client.post("/users/login", json={"username": "alice", "password": "wrong"}).status_code == 401
+    assert client.post("/users/login", json={"username": "bob", "password": "secret"}).status_code == 401